@@ -0,0 +1,45 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from typing import Callable, Optional
+from gymnasium import Env
+
+
+def run_episode(make_env: Callable[[], Env], policy: Callable[[np.ndarray], np.ndarray], seed: int) -> np.ndarray:
+    """
+    Creates an environment, runs one episode with the given policy and returns the summed reward vector.
+    """
+    env = make_env()
+    observation, _ = env.reset(seed=seed)
+
+    episode_reward = 0
+    terminated = truncated = False
+    while not (terminated or truncated):
+        observation, reward, terminated, truncated, _ = env.step(policy(observation))
+        episode_reward = episode_reward + reward
+
+    env.close()
+    return episode_reward
+
+
+def run_batch(
+    make_env: Callable[[], Env],
+    policy: Callable[[np.ndarray], np.ndarray],
+    seeds: list[int],
+    max_workers: Optional[int] = None,
+    use_threads: bool = False,
+) -> np.ndarray:
+    """
+    Runs independent episodes, one per seed, in parallel and returns their summed rewards as a
+    (number of seeds, number of objectives) array, in the order of `seeds`.
+
+    Every episode creates its own environment with `make_env`, so environments are never shared or
+    pickled. With processes (the default), `make_env` and `policy` are pickled to the workers and
+    must be defined at module level. Threads avoid that and the process start-up cost, but
+    only the compiled reservoir integration (which releases the GIL) runs concurrently.
+    """
+    executor_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+
+    with executor_class(max_workers=max_workers) as executor:
+        episode_rewards = executor.map(run_episode, repeat(make_env), repeat(policy), seeds)
+        return np.stack(list(episode_rewards))
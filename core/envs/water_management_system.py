@@ -1,12 +1,18 @@
 import gymnasium as gym
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from gymnasium.spaces import Box, Dict, Space
 from gymnasium.core import ObsType, RenderFrame
 from typing import Any, Union, Optional
 from core.models.flow import Flow
 from core.models.facility import Facility, ControlledFacility
+from core.utils.utils import fixed_duration_seconds
+
+# Kinds of water systems, determining how they are stepped
+FACILITY = 0
+CONTROLLED_FACILITY = 1
+FLOW = 2
 
 
 class WaterManagementSystem(gym.Env):
@@ -26,49 +32,98 @@ class WaterManagementSystem(gym.Env):
         self.timestep_size: relativedelta = timestep_size
         self.timestep: int = 0
 
+        # Timesteps of a fixed length (e.g. hours) are added to the date as a timedelta, which is much cheaper than
+        # relativedelta arithmetic; calendar-dependent timesteps (e.g. months) still need the relativedelta.
+        timestep_seconds = fixed_duration_seconds(timestep_size)
+        self._timestep_delta: Union[timedelta, relativedelta] = (
+            timedelta(seconds=timestep_seconds) if timestep_seconds is not None else timestep_size
+        )
+
         self.seed: int = seed
 
+        self._controlled_facilities: list[ControlledFacility] = [
+            water_system for water_system in self.water_systems if isinstance(water_system, ControlledFacility)
+        ]
+
         self.observation_space: Space = self._determine_observation_space()
         self.action_space: Space = self._determine_action_space()
         self.reward_space: Space = Box(-np.inf, np.inf, shape=(len(rewards.keys()),))
 
+        # Flat buffers for the step results
+        self._reward_buffer: np.ndarray = np.zeros(len(rewards), dtype=np.float64)
+        self._observation_buffer: np.ndarray = np.zeros(
+            sum(int(np.prod(facility.observation_space.shape)) for facility in self._controlled_facilities),
+            dtype=np.float64,
+        )
+
+        self._water_system_steps: list[tuple] = self._determine_water_system_steps()
+
         self.observation: np.array = self._determine_observation()
 
         for water_system in self.water_systems:
             water_system.current_date = self.current_date
             water_system.timestep_size = self.timestep_size
 
-    def _determine_observation(self) -> np.array:
-        result = []
+    def _determine_water_system_steps(self) -> list[tuple]:
+        """
+        Classifies every water system once, so that step() does not repeat type checks and lookups.
+        Each entry holds the kind of the water system, the water system itself, the index of the objective
+        its reward is added to (or None) and the slice of the observation it writes to (or None).
+        """
+        reward_index = {objective_name: index for index, objective_name in enumerate(self.rewards)}
+        water_system_steps = []
+        observation_size = 0
+
         for water_system in self.water_systems:
             if isinstance(water_system, ControlledFacility):
-                result.append(water_system.determine_observation())
-        return np.array(result)
-
-    def _determine_observation_space(self) -> Dict:
-        return Dict(
-            {
-                water_system.name: water_system.observation_space
-                for water_system in self.water_systems
-                if isinstance(water_system, ControlledFacility)
-            }
+                kind = CONTROLLED_FACILITY
+                number_of_observations = int(np.prod(water_system.observation_space.shape))
+                observation_slice = slice(observation_size, observation_size + number_of_observations)
+                observation_size += number_of_observations
+            elif isinstance(water_system, Facility):
+                kind = FACILITY
+                observation_slice = None
+            elif isinstance(water_system, Flow):
+                kind = FLOW
+                observation_slice = None
+            else:
+                raise ValueError()
+
+            # Add reward to the objective assigned to this Facility (unless it is a Flow).
+            objective_index = (
+                reward_index[water_system.objective_name] if kind != FLOW and water_system.objective_name else None
+            )
+
+            water_system_steps.append((kind, water_system, objective_index, observation_slice))
+
+        return water_system_steps
+
+    def _determine_observation(self) -> np.array:
+        for kind, water_system, _, observation_slice in self._water_system_steps:
+            if kind == CONTROLLED_FACILITY:
+                water_system.determine_observation(self._observation_buffer[observation_slice])
+        return self._observation_buffer.copy()
+
+    def _determine_observation_space(self) -> Box:
+        # Observations are returned as one flat array, concatenated in the order of the water systems
+        observation_spaces = [facility.observation_space for facility in self._controlled_facilities]
+        return Box(
+            low=np.concatenate([np.ravel(space.low) for space in observation_spaces] or [np.empty(0)]),
+            high=np.concatenate([np.ravel(space.high) for space in observation_spaces] or [np.empty(0)]),
+            dtype=np.float64,
         )
 
     def _determine_action_space(self) -> Dict:
-        return Dict(
-            {
-                water_system.name: water_system.action_space
-                for water_system in self.water_systems
-                if isinstance(water_system, ControlledFacility)
-            }
-        )
+        return Dict({facility.name: facility.action_space for facility in self._controlled_facilities})
 
     def _is_truncated(self) -> bool:
         return False
 
     def _determine_info(self) -> dict[str, Any]:
         # TODO: decide on what we wnat to output in the info.
-        return {"water_systems": self.water_systems}
+        # Only plain data, like the info of a step: the info of a vector environment is pickled from its
+        # workers, and the water systems themselves are available as self.water_systems.
+        return {"date": self.current_date}
 
     def reset(self, seed: Optional[int] = None, options: Optional[dict] = None) -> tuple[ObsType, dict[str, Any]]:
         # We need the following line to seed self.np_random.
@@ -87,35 +142,28 @@ class WaterManagementSystem(gym.Env):
         return self.observation, self._determine_info()
 
     def step(self, action: np.array) -> tuple[np.array, np.array, bool, bool, dict]:
-        final_reward = {}
-
         # Reset rewards
-        for key in self.rewards.keys():
-            final_reward[key] = 0
+        self._reward_buffer.fill(0)
+        self._observation_buffer.fill(0)
+
+        final_info = {"date": self.current_date}
 
-        final_observation = {}
         final_terminated = False
         final_truncated = False
-        final_info = {"date": self.current_date}
 
-        for water_system in self.water_systems:
+        for kind, water_system, objective_index, observation_slice in self._water_system_steps:
             water_system.current_date = self.current_date
 
-            if isinstance(water_system, ControlledFacility):
-                observation, reward, terminated, truncated, info = water_system.step(action[water_system.name])
-            elif isinstance(water_system, Facility) or isinstance(water_system, Flow):
-                observation, reward, terminated, truncated, info = water_system.step()
+            if kind == CONTROLLED_FACILITY:
+                # The facility writes its observation straight into its slice of the observation buffer
+                _, reward, terminated, truncated, info = water_system.step(
+                    action[water_system.name], self._observation_buffer[observation_slice]
+                )
             else:
-                raise ValueError()
+                _, reward, terminated, truncated, info = water_system.step()
 
-            # Set observation for a Controlled Facility.
-            if isinstance(water_system, ControlledFacility):
-                final_observation[water_system.name] = observation
-
-            # Add reward to the objective assigned to this Facility (unless it is a Flow).
-            if isinstance(water_system, Facility) or isinstance(water_system, ControlledFacility):
-                if water_system.objective_name:
-                    final_reward[water_system.objective_name] += reward
+            if objective_index is not None:
+                self._reward_buffer[objective_index] += reward
 
             # Store additional information
             final_info[water_system.name] = info
@@ -128,11 +176,12 @@ class WaterManagementSystem(gym.Env):
                 break
 
         self.timestep += 1
-        self.current_date += self.timestep_size
+        self.current_date += self._timestep_delta
 
+        # Copies, so that results returned by earlier steps are not overwritten by later ones
         return (
-            np.array(list(final_observation.values())).flatten(),
-            np.array(list(final_reward.values())).flatten(),
+            self._observation_buffer.copy(),
+            self._reward_buffer.copy(),
             final_terminated,
             final_truncated,
             final_info,
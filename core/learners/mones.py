@@ -1,13 +1,14 @@
-import time
 from pprint import pprint
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.func import functional_call, stack_module_state, vmap
 import numpy as np
 import copy
 
 from gymnasium import Space, spaces
+from gymnasium.vector import AsyncVectorEnv
 
 from core.learners.metrics import non_dominated, non_dominated_rank, crowding_distance, compute_hypervolume
 from core.log.logger import Logger
@@ -50,6 +51,39 @@ def run_episode(env, model):
     return torch.from_numpy(e_r).float()
 
 
+def batched_forward(population):
+    # Stacks the parameters of the models and vectorizes their (identical) forward pass over them,
+    # so every layer computes the outputs of the whole population in one batched matmul
+    params, buffers = stack_module_state(population)
+    base_model = copy.deepcopy(population[0]).to("meta")
+
+    def forward(p, b, o):
+        return functional_call(base_model, (p, b), (o,))
+
+    population_forward = vmap(forward)
+    return lambda observations: population_forward(params, buffers, observations)
+
+
+def run_vector_episode(vector_env, population):
+    # Every model of the population acts in its own sub-environment of the vector environment
+    e_r = 0
+    running = np.ones(vector_env.num_envs, dtype=bool)
+    o, _ = vector_env.reset()
+    population_forward = batched_forward(population)
+
+    while running.any():
+        with torch.no_grad():
+            action = population_forward(torch.from_numpy(o).float())
+            action = action.detach().numpy()
+        n_o, r, terminated, truncated, _ = vector_env.step(action)
+        # Sub-environments are reset automatically when their episode ends, so rewards of the
+        # episodes that start afterwards are not added
+        e_r += r * running[:, None]
+        running &= ~(terminated | truncated)
+        o = n_o
+    return torch.from_numpy(e_r).float()
+
+
 def indicator_hypervolume(points, ref, nd_penalty=0.0):
     # compute hypervolume of dataset
     nd_i = non_dominated(points, return_indexes=True)[1]
@@ -122,11 +156,14 @@ class MONES(object):
         # optimizer to change distribution parameters
         self.opt = torch.optim.Adam([{"params": mu}, {"params": sigma}], lr=1e-1)
 
+        # one environment per member of the population, stepped in parallel processes
+        self.vector_env = AsyncVectorEnv([self.make_env] * self.n_population, shared_memory=True)
+
     def step(self):
         # using current theta, sample policies from Normal(theta)
         population, z = self.sample_population()
         # run episode for these policies
-        returns = self.evaluate_population(self.make_env(), population)
+        returns = self.evaluate_population(self.vector_env, population)
         returns = returns.detach().numpy()
 
         indicator_metric = self.indicator(returns)
@@ -167,19 +204,23 @@ class MONES(object):
     def train(self, iterations):
         self.start()
 
-        for i in range(iterations):
-            print(f"Started epoch number: {i}")
-            info = self.step()
-            returns = info["returns"]
-            # logging
-            self.logger.put("train/metric", info["metric"], i, "scalar")
-            self.logger.put("train/returns", returns, i, f"{returns.shape[-1]}d")
-            if self.ref_point is not None:
-                print(f"Returns {returns} and ref point {self.ref_point}")
-                hv = compute_hypervolume(returns, self.ref_point)
-                self.logger.put("train/hypervolume", hv, i, "scalar")
-
-            print(f'Iteration {i} \t Metric {info["metric"]} \t')
+        # the worker processes of the vector environment are closed even if an epoch fails
+        try:
+            for i in range(iterations):
+                print(f"Started epoch number: {i}")
+                info = self.step()
+                returns = info["returns"]
+                # logging
+                self.logger.put("train/metric", info["metric"], i, "scalar")
+                self.logger.put("train/returns", returns, i, f"{returns.shape[-1]}d")
+                if self.ref_point is not None:
+                    print(f"Returns {returns} and ref point {self.ref_point}")
+                    hv = compute_hypervolume(returns, self.ref_point)
+                    self.logger.put("train/hypervolume", hv, i, "scalar")
+
+                print(f'Iteration {i} \t Metric {info["metric"]} \t')
+        finally:
+            self.vector_env.close()
 
         print("=" * 20)
         print("DONE TRAINING, LAST POPULATION ND RETURNS")
@@ -196,15 +237,9 @@ class MONES(object):
             z.append(z_i)
         return population, torch.stack(z)
 
-    def evaluate_population(self, env, population):
+    def evaluate_population(self, vector_env, population):
         returns = torch.zeros(len(population), self.n_objectives)
-        for i in range(len(population)):
-            print(f"Population \t {i+1}/{len(population)}")
-            p_return = torch.zeros(self.n_runs, self.n_objectives)
-            for r in range(self.n_runs):
-                # print(f'Run \t\t {r+1}/{self.n_runs}')
-                temp_time = time.time()
-                p_return[r] = run_episode(env, population[i])
-                # print(f"Run took \t {time.time() - temp_time} seconds")
-            returns[i] = torch.mean(p_return, dim=0)
-        return returns
+        for r in range(self.n_runs):
+            print(f"Run \t {r+1}/{self.n_runs}")
+            returns += run_vector_episode(vector_env, population)
+        return returns / self.n_runs
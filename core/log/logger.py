@@ -7,6 +7,11 @@ import time
 import threading
 import atexit
 
+# Datasets are chunked and gzip-compressed (at the fastest level), so they can grow cheaply and be read partially
+SCALAR_CHUNKS = (1024, 2)
+COMPRESSION = "gzip"
+COMPRESSION_LEVEL = 1
+
 
 def resize_image(frame, max_width=100):
     w, h = frame.shape[:2]
@@ -73,7 +78,15 @@ class Logger(object):
         self.to_log[tag] = []
 
         if not tag in log_file:
-            log_file.create_dataset(tag, toadd.shape, maxshape=(None, 2), dtype=np.float32)
+            log_file.create_dataset(
+                tag,
+                toadd.shape,
+                maxshape=(None, 2),
+                dtype=np.float32,
+                chunks=SCALAR_CHUNKS,
+                compression=COMPRESSION,
+                compression_opts=COMPRESSION_LEVEL,
+            )
             log_file[tag].attrs["type"] = self.types[tag]
         else:
             log_file[tag].resize(log_file[tag].len() + len(toadd), 0)
@@ -86,9 +99,23 @@ class Logger(object):
         self.to_log[tag] = []
 
         if not (tag + "/ndarray") in log_file:
-            log_file.create_dataset(tag + "/step", steps.shape, maxshape=(None,), dtype=np.int32)
             log_file.create_dataset(
-                tag + "/ndarray", ndarray.shape, maxshape=(None,) + tuple(ndarray.shape[1:]), dtype=ndarray.dtype
+                tag + "/step",
+                steps.shape,
+                maxshape=(None,),
+                dtype=np.int32,
+                chunks=True,
+                compression=COMPRESSION,
+                compression_opts=COMPRESSION_LEVEL,
+            )
+            log_file.create_dataset(
+                tag + "/ndarray",
+                ndarray.shape,
+                maxshape=(None,) + tuple(ndarray.shape[1:]),
+                dtype=ndarray.dtype,
+                chunks=True,
+                compression=COMPRESSION,
+                compression_opts=COMPRESSION_LEVEL,
             )
             log_file[tag].attrs["type"] = self.types[tag]
         else:
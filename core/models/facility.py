@@ -6,13 +6,18 @@ from gymnasium.spaces import Space
 from gymnasium.core import ObsType, ActType
 from typing import SupportsFloat, Optional
 from core.models.objective import Objective
+from core.utils.utils import INITIAL_BUFFER_SIZE, ensure_capacity, fixed_duration_seconds
 
 
 class Facility(ABC):
     def __init__(self, name: str, objective_function=Objective.no_objective, objective_name: str = "") -> None:
         self.name: str = name
-        self.all_inflow: list[float] = []
-        self.all_outflow: list[float] = []
+        # Buffers with the inflow and outflow of every timestep, valid up to inflow_count and outflow_count
+        # (all_inflow and all_outflow are the recorded parts)
+        self._inflow_buffer: np.ndarray = np.empty(INITIAL_BUFFER_SIZE, dtype=np.float64)
+        self._outflow_buffer: np.ndarray = np.empty(INITIAL_BUFFER_SIZE, dtype=np.float64)
+        self.inflow_count: int = 0
+        self.outflow_count: int = 0
 
         self.objective_function = objective_function
         self.objective_name = objective_name
@@ -23,6 +28,31 @@ class Facility(ABC):
 
         self.split_release = None
 
+    @property
+    def all_inflow(self) -> np.ndarray:
+        return self._inflow_buffer[: self.inflow_count]
+
+    @property
+    def all_outflow(self) -> np.ndarray:
+        return self._outflow_buffer[: self.outflow_count]
+
+    @property
+    def timestep_size(self) -> Optional[relativedelta]:
+        return self._timestep_size
+
+    @timestep_size.setter
+    def timestep_size(self, timestep_size: Optional[relativedelta]) -> None:
+        self._timestep_size = timestep_size
+        # Length of a timestep in seconds if it does not depend on the date (None for e.g. monthly timesteps)
+        self.timestep_seconds: Optional[float] = (
+            fixed_duration_seconds(timestep_size) if timestep_size is not None else None
+        )
+
+    def determine_timestep_seconds(self) -> float:
+        if self.timestep_seconds is not None:
+            return self.timestep_seconds
+        return (self.current_date + self.timestep_size - self.current_date).total_seconds()
+
     @abstractmethod
     def determine_reward(self) -> float:
         raise NotImplementedError()
@@ -38,13 +68,16 @@ class Facility(ABC):
         return False
 
     def get_inflow(self, timestep: int) -> float:
+        # Indexes the recorded part, so that unrecorded timesteps raise IndexError and negative ones count from the end
         return self.all_inflow[timestep]
 
     def set_inflow(self, timestep: int, inflow: float) -> None:
-        if len(self.all_inflow) == timestep:
-            self.all_inflow.append(inflow)
-        elif len(self.all_inflow) > timestep:
-            self.all_inflow[timestep] += inflow
+        if self.inflow_count == timestep:
+            self._inflow_buffer = ensure_capacity(self._inflow_buffer, timestep + 1)
+            self._inflow_buffer[timestep] = inflow
+            self.inflow_count += 1
+        elif self.inflow_count > timestep:
+            self._inflow_buffer[timestep] += inflow
         else:
             raise IndexError
 
@@ -54,8 +87,13 @@ class Facility(ABC):
     def get_outflow(self, timestep: int) -> float:
         return self.all_outflow[timestep]
 
+    def record_outflow(self, outflow: float) -> None:
+        self._outflow_buffer = ensure_capacity(self._outflow_buffer, self.outflow_count + 1)
+        self._outflow_buffer[self.outflow_count] = outflow
+        self.outflow_count += 1
+
     def step(self) -> tuple[ObsType, float, bool, bool, dict]:
-        self.all_outflow.append(self.determine_outflow())
+        self.record_outflow(self.determine_outflow())
         # TODO: Determine if we need to satisy any terminating codnitions for facility.
         reward = self.determine_reward()
         terminated = self.is_terminated()
@@ -68,8 +106,8 @@ class Facility(ABC):
 
     def reset(self) -> None:
         self.timestep: int = 0
-        self.all_inflow: list[float] = []
-        self.all_outflow: list[float] = []
+        self.inflow_count = 0
+        self.outflow_count = 0
 
     def determine_info(self) -> dict:
         raise {}
@@ -92,8 +130,12 @@ class ControlledFacility(ABC):
         max_capacity: float = float("inf"),
     ) -> None:
         self.name: str = name
-        self.all_inflow: list[float] = []
-        self.all_outflow: list[float] = []
+        # Buffers with the inflow and outflow of every timestep, valid up to inflow_count and outflow_count
+        # (all_inflow and all_outflow are the recorded parts)
+        self._inflow_buffer: np.ndarray = np.empty(INITIAL_BUFFER_SIZE, dtype=np.float64)
+        self._outflow_buffer: np.ndarray = np.empty(INITIAL_BUFFER_SIZE, dtype=np.float64)
+        self.inflow_count: int = 0
+        self.outflow_count: int = 0
 
         self.observation_space: Space = observation_space
         self.action_space: Space = action_space
@@ -110,6 +152,31 @@ class ControlledFacility(ABC):
         self.should_split_release = np.prod(self.action_space.shape) > 1
         self.split_release = None
 
+    @property
+    def all_inflow(self) -> np.ndarray:
+        return self._inflow_buffer[: self.inflow_count]
+
+    @property
+    def all_outflow(self) -> np.ndarray:
+        return self._outflow_buffer[: self.outflow_count]
+
+    @property
+    def timestep_size(self) -> Optional[relativedelta]:
+        return self._timestep_size
+
+    @timestep_size.setter
+    def timestep_size(self, timestep_size: Optional[relativedelta]) -> None:
+        self._timestep_size = timestep_size
+        # Length of a timestep in seconds if it does not depend on the date (None for e.g. monthly timesteps)
+        self.timestep_seconds: Optional[float] = (
+            fixed_duration_seconds(timestep_size) if timestep_size is not None else None
+        )
+
+    def determine_timestep_seconds(self) -> float:
+        if self.timestep_seconds is not None:
+            return self.timestep_seconds
+        return (self.current_date + self.timestep_size - self.current_date).total_seconds()
+
     @abstractmethod
     def determine_reward(self) -> float:
         raise NotImplementedError()
@@ -119,7 +186,11 @@ class ControlledFacility(ABC):
         raise NotImplementedError()
 
     @abstractmethod
-    def determine_observation(self) -> ObsType:
+    def determine_observation(self, out: Optional[np.ndarray] = None) -> ObsType:
+        """
+        Returns the observation of the facility. If `out` is given, the observation is written to it
+        (e.g. a slice of a flat observation buffer) and `out` is returned instead of a new object.
+        """
         raise NotImplementedError()
 
     @abstractmethod
@@ -130,24 +201,34 @@ class ControlledFacility(ABC):
         return False
 
     def get_inflow(self, timestep: int) -> float:
+        # Indexes the recorded part, so that unrecorded timesteps raise IndexError and negative ones count from the end
         return self.all_inflow[timestep]
 
     def set_inflow(self, timestep: int, inflow: float) -> None:
-        if len(self.all_inflow) == timestep:
-            self.all_inflow.append(inflow)
-        elif len(self.all_inflow) > timestep:
-            self.all_inflow[timestep] += inflow
+        if self.inflow_count == timestep:
+            self._inflow_buffer = ensure_capacity(self._inflow_buffer, timestep + 1)
+            self._inflow_buffer[timestep] = inflow
+            self.inflow_count += 1
+        elif self.inflow_count > timestep:
+            self._inflow_buffer[timestep] += inflow
         else:
             raise IndexError
 
     def get_outflow(self, timestep: int) -> float:
         return self.all_outflow[timestep]
 
-    def step(self, action: ActType) -> tuple[ObsType, SupportsFloat, bool, bool, dict]:
-        self.all_outflow.append(self.determine_outflow(action))
+    def record_outflow(self, outflow: float) -> None:
+        self._outflow_buffer = ensure_capacity(self._outflow_buffer, self.outflow_count + 1)
+        self._outflow_buffer[self.outflow_count] = outflow
+        self.outflow_count += 1
+
+    def step(
+        self, action: ActType, observation_out: Optional[np.ndarray] = None
+    ) -> tuple[ObsType, SupportsFloat, bool, bool, dict]:
+        self.record_outflow(self.determine_outflow(action))
         # TODO: Change stored_water to multiple outflows.
 
-        observation = self.determine_observation()
+        observation = self.determine_observation(observation_out)
         reward = self.determine_reward()
         terminated = self.is_terminated()
         truncated = self.is_truncated()
@@ -165,8 +246,8 @@ class ControlledFacility(ABC):
 
     def reset(self) -> None:
         self.timestep: int = 0
-        self.all_inflow: list[float] = []
-        self.all_outflow: list[float] = []
+        self.inflow_count = 0
+        self.outflow_count = 0
 
     def determine_info(self) -> dict:
         raise {}
@@ -1,3 +1,4 @@
+import numpy as np
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from typing import Union, Optional
@@ -24,6 +25,11 @@ class Flow:
         else:
             self.destinations: dict[Union[Facility, ControlledFacility], float] = destinations
 
+        # Destinations and their inflow ratios in a fixed order, so that the inflows of all destinations are
+        # computed at once rather than by iterating the dict and the sources for every destination
+        self._destination_list: list[Union[Facility, ControlledFacility]] = list(self.destinations or {})
+        self.destination_ratios: np.ndarray = np.array(list((self.destinations or {}).values()), dtype=np.float64)
+
         self.max_capacity: float = max_capacity
         self.evaporation_rate: float = evaporation_rate
 
@@ -54,20 +60,40 @@ class Flow:
                 source_outflow = source.get_outflow(timestep_after_delay_clipped)
 
                 # Determine if source has custom split policy
-                if source.split_release:
+                if source.split_release is not None:
                     total_source_outflow += source_outflow * source.split_release[destination_index]
                 else:
                     total_source_outflow += source_outflow * destination_inflow_ratio
 
             return total_source_outflow
 
+    def determine_destination_inflows(self) -> np.ndarray:
+        """
+        Returns the inflow into every destination (before evaporation), in the order of the destinations.
+        """
+        if self.timestep - self.delay < 0 and self.default_outflow:
+            return np.full(len(self._destination_list), self.default_outflow, dtype=np.float64)
+
+        timestep_after_delay_clipped = max(0, self.timestep - self.delay)
+        destination_inflows = np.zeros(len(self._destination_list), dtype=np.float64)
+
+        # Calculate each source contribution to the destinations
+        for source in self.sources:
+            source_outflow = source.get_outflow(timestep_after_delay_clipped)
+
+            # Determine if source has custom split policy (computed in float64, like the ratios)
+            if source.split_release is not None:
+                destination_inflows += np.multiply(source_outflow, source.split_release, dtype=np.float64)
+            else:
+                destination_inflows += source_outflow * self.destination_ratios
+
+        return destination_inflows
+
     def set_destination_inflow(self) -> None:
-        for destination_index, (destination, destination_inflow_ratio) in enumerate(self.destinations.items()):
-            destination_inflow = self.determine_source_outflow_by_destination(
-                destination_index, destination_inflow_ratio
-            )
+        destination_inflows = self.determine_destination_inflows() * (1.0 - self.evaporation_rate)
 
-            destination.set_inflow(self.timestep, destination_inflow * (1.0 - self.evaporation_rate))
+        for destination, destination_inflow in zip(self._destination_list, destination_inflows.tolist()):
+            destination.set_inflow(self.timestep, destination_inflow)
 
     def is_truncated(self) -> bool:
         return False
@@ -121,6 +147,14 @@ class Inflow(Flow):
 
             return self.all_inflow[timestep_after_delay_clipped] * destination_inflow_ratio
 
+    def determine_destination_inflows(self) -> np.ndarray:
+        if self.timestep - self.delay < 0 and self.default_outflow:
+            return np.full(len(self._destination_list), self.default_outflow, dtype=np.float64)
+
+        timestep_after_delay_clipped = max(0, self.timestep - self.delay) % len(self.all_inflow)
+
+        return np.multiply(self.all_inflow[timestep_after_delay_clipped], self.destination_ratios, dtype=np.float64)
+
     def is_truncated(self) -> bool:
         return self.timestep >= len(self.all_inflow)
 
@@ -1,4 +1,18 @@
+import numpy as np
+from numba import njit
+from typing import Optional
 from core.models.facility import Facility
+from gymnasium.core import ObsType
+
+
+@njit(cache=True)
+def _irrigation_supply(all_demand: np.ndarray, demand_index: int, inflow: float) -> tuple[float, float, float]:
+    """
+    Returns the demand, consumption and deficit of an irrigation district for one timestep.
+    """
+    demand = all_demand[demand_index]
+    consumption = demand if demand < inflow else inflow
+    return demand, consumption, demand - consumption
 
 
 class IrrigationDistrict(Facility):
@@ -29,12 +43,37 @@ class IrrigationDistrict(Facility):
 
     def __init__(self, name: str, all_demand: list[float], objective_function, objective_name: str) -> None:
         super().__init__(name, objective_function, objective_name)
-        self.all_demand: list[float] = all_demand
+        # Kept in the incoming dtype and memory of an array (e.g. a float32 column view of shared exogenous data)
+        self.all_demand: np.ndarray = np.asarray(all_demand)
         self.total_deficit: float = 0
         self.all_deficit: list[float] = []
 
+        # Index of the current timestep in all_demand, wrapped around the length of the demand series
+        self._demand_index: int = 0
+        self._demand_length: int = len(self.all_demand)
+
+        # (timestep, (inflow, demand, consumption, deficit)) of the last determined supply, as it is needed for
+        # the outflow, reward and info of a step
+        self._supply_cache: Optional[tuple[int, tuple[float, float, float, float]]] = None
+
     def get_current_demand(self) -> float:
-        return self.all_demand[self.timestep % len(self.all_demand)]
+        return self.all_demand[self._demand_index]
+
+    def determine_supply(self) -> tuple[float, float, float, float]:
+        """
+        Determines the inflow, demand, consumption and deficit of the irrigation district for the current timestep
+
+        Returns:
+        ----------
+        tuple[float, float, float, float]
+            Inflow, demand, consumption and deficit
+        """
+        if self._supply_cache is None or self._supply_cache[0] != self.timestep:
+            inflow = self.get_inflow(self.timestep)
+            demand, consumption, deficit = _irrigation_supply(self.all_demand, self._demand_index, inflow)
+            self._supply_cache = (self.timestep, (inflow, demand, consumption, deficit))
+
+        return self._supply_cache[1]
 
     def determine_deficit(self) -> float:
         """
@@ -45,8 +84,7 @@ class IrrigationDistrict(Facility):
         float
             Water deficit of the irrigation district
         """
-        consumption = self.determine_consumption()
-        deficit = self.get_current_demand() - consumption
+        _, _, _, deficit = self.determine_supply()
         self.total_deficit += deficit
         self.all_deficit.append(deficit)
         return deficit
@@ -61,7 +99,8 @@ class IrrigationDistrict(Facility):
         float
             Reward for the objective function.
         """
-        return self.objective_function(self.get_current_demand(), self.get_inflow(self.timestep))
+        inflow, demand, _, _ = self.determine_supply()
+        return self.objective_function(demand, inflow)
 
     def determine_consumption(self) -> float:
         """
@@ -72,10 +111,15 @@ class IrrigationDistrict(Facility):
         float
             Water consumption
         """
-        return min(self.get_current_demand(), self.get_inflow(self.timestep))
+        _, _, consumption, _ = self.determine_supply()
+        return consumption
+
+    def determine_outflow(self) -> float:
+        inflow, _, consumption, _ = self.determine_supply()
+        return inflow - consumption
 
     def is_truncated(self) -> bool:
-        return self.timestep >= len(self.all_demand)
+        return self.timestep >= self._demand_length
 
     def determine_info(self) -> dict:
         """
@@ -86,16 +130,26 @@ class IrrigationDistrict(Facility):
         dict
             Info about irrigation district (name, name, inflow, outflow, demand, timestep, deficit)
         """
+        inflow, demand, _, _ = self.determine_supply()
         return {
             "name": self.name,
-            "inflow": self.get_inflow(self.timestep),
+            "inflow": inflow,
             "outflow": self.get_outflow(self.timestep),
-            "demand": self.get_current_demand(),
+            "demand": demand,
             "total_deficit": self.total_deficit,
             "list_deficits": self.all_deficit,
         }
 
+    def step(self) -> tuple[ObsType, float, bool, bool, dict]:
+        # Inflow of the current timestep is only final once the facility is stepped
+        self._supply_cache = None
+        result = super().step()
+        self._demand_index = (self._demand_index + 1) % self._demand_length
+        return result
+
     def reset(self) -> None:
         super().reset()
         self.total_deficit = 0
         self.all_deficit = []
+        self._demand_index = 0
+        self._supply_cache = None
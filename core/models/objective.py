@@ -1,3 +1,20 @@
+import numpy as np
+
+
+class SequentialScalar:
+    """
+    Objective that multiplies a value by the scalar at the given index (e.g. the energy price of a timestep).
+    The scalars are held as a float32 array, so indices and values may also be arrays (e.g. one per member of
+    a population), evaluated in a single multiplication.
+    """
+
+    def __init__(self, scalars: list[float]) -> None:
+        self.scalars: np.ndarray = np.ascontiguousarray(scalars, dtype=np.float32)
+
+    def __call__(self, index, value):
+        return value * self.scalars[index]
+
+
 class Objective:
 
     @staticmethod
@@ -33,5 +50,5 @@ class Objective:
         return lambda value: value * scalar
 
     @staticmethod
-    def sequential_scalar(scalar: list[float]) -> float:
-        return lambda index, value: value * scalar[index]
+    def sequential_scalar(scalar: list[float]) -> SequentialScalar:
+        return SequentialScalar(scalar)
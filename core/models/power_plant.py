@@ -1,6 +1,9 @@
 from core.models.facility import Facility
-from core.models.reservoir import Reservoir
+from core.models.reservoir import LEVEL, Reservoir
+from core.utils.utils import INITIAL_BUFFER_SIZE, ensure_capacity
 from scipy.constants import g
+from gymnasium.core import ObsType
+from typing import Optional
 import numpy as np
 
 
@@ -27,6 +30,10 @@ class PowerPlant(Facility):
         Used to calculate at what level the head of the power plant operates
     water_usage : float
         Amount of water  that is used by plant, decimal coefficient
+    production_vector : np.ndarray
+        Production (MWh) of every recorded timestep
+    production_sum : float
+        Total production (MWh) since the last reset
 
     Methods:
     ----------
@@ -59,10 +66,23 @@ class PowerPlant(Facility):
         self.max_capacity: float = max_capacity
         self.reservoir: Reservoir = reservoir
         self.water_usage: float = water_usage
-        self.production_vector: np.ndarray = np.empty(0, dtype=np.float64)
+        # Buffer with the production of every timestep, valid up to production_count
+        self._production_buffer: np.ndarray = np.empty(INITIAL_BUFFER_SIZE, dtype=np.float64)
+        self.production_count: int = 0
+        self.production_sum: float = 0.0
+        # (timestep, turbine flow) of the last computed turbine flow, as it is needed for both outflow and reward
+        self._turbine_flow_cache: Optional[tuple[int, float]] = None
+
+    @property
+    def production_vector(self) -> np.ndarray:
+        return self._production_buffer[: self.production_count]
 
     def determine_turbine_flow(self) -> float:
-        return max(self.min_turbine_flow, min(self.max_turbine_flow, self.get_inflow(self.timestep)))
+        if self._turbine_flow_cache is None or self._turbine_flow_cache[0] != self.timestep:
+            turbine_flow = max(self.min_turbine_flow, min(self.max_turbine_flow, self.get_inflow(self.timestep)))
+            self._turbine_flow_cache = (self.timestep, turbine_flow)
+
+        return self._turbine_flow_cache[1]
 
     # Constants are configured as parameters with default values
     def determine_production(self) -> float:
@@ -80,7 +100,9 @@ class PowerPlant(Facility):
         turbine_flow = self.determine_turbine_flow()
 
         # Uses water level from reservoir to determine water level
-        water_level = self.reservoir.level_vector[-1] if self.reservoir.level_vector else 0
+        water_level = (
+            self.reservoir.history[LEVEL, self.reservoir.recorded_steps - 1] if self.reservoir.recorded_steps else 0
+        )
         # Calculate at what level the head will generate power, using water_level of the outflow and head_start_level
         head = max(0.0, water_level - self.head_start_level)
 
@@ -91,12 +113,14 @@ class PowerPlant(Facility):
         )
 
         # Calculate the numbe rof hours the power plant has been running.
-        final_date = self.current_date + self.timestep_size
-        timestep_hours = (final_date - self.current_date).total_seconds() / 3600
+        timestep_hours = self.determine_timestep_seconds() / 3600
 
         # Hydro-energy power production in mWh
         production = power_in_mw * timestep_hours
-        self.production_vector = np.append(self.production_vector, production)
+        self._production_buffer = ensure_capacity(self._production_buffer, self.production_count + 1)
+        self._production_buffer[self.production_count] = production
+        self.production_count += 1
+        self.production_sum += production
 
         return production
 
@@ -140,14 +164,21 @@ class PowerPlant(Facility):
             "name": self.name,
             "inflow": self.get_inflow(self.timestep),
             "outflow": self.get_outflow(self.timestep),
-            "monthly_production": self.production_vector[-1],
+            "monthly_production": self._production_buffer[self.production_count - 1] if self.production_count else None,
             "water_usage": self.water_usage,
-            "total production (MWh)": sum(self.production_vector),
+            "total production (MWh)": self.production_sum,
         }
 
     def determine_month(self) -> int:
         return self.timestep % 12
 
+    def step(self) -> tuple[ObsType, float, bool, bool, dict]:
+        # Inflow of the current timestep is only final once the facility is stepped
+        self._turbine_flow_cache = None
+        return super().step()
+
     def reset(self) -> None:
         super().reset()
-        self.production_vector = np.empty(0, dtype=np.float64)
+        self._turbine_flow_cache = None
+        self.production_count = 0
+        self.production_sum = 0.0
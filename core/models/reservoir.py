@@ -1,8 +1,164 @@
 from core.models.facility import ControlledFacility
 from gymnasium.spaces import Box, Space
 import numpy as np
+from numba import njit
+from datetime import timedelta
+from typing import Optional
 from dateutil.relativedelta import relativedelta
-from numpy.core.multiarray import interp as compiled_interp
+from core.utils.utils import INITIAL_BUFFER_SIZE, ensure_capacity, fixed_duration_seconds
+
+# Rows of Reservoir.history
+STORAGE = 0
+LEVEL = 1
+RELEASE = 2
+
+
+def _segment_slopes(xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    Returns the slopes of the segments of the piecewise-linear curves `fp` (a row per curve) sampled at `xp`,
+    computed as np.interp computes them, so that lookups only need a multiplication and an addition.
+    """
+    return np.ascontiguousarray(np.diff(fp) / np.diff(xp))
+
+
+@njit(cache=True)
+def _interp_from_index(x: float, xp: np.ndarray, fp: np.ndarray, slopes: np.ndarray, index: int) -> tuple[float, int]:
+    """
+    Piecewise-linear interpolation equivalent to np.interp for a single value, which resumes the search
+    for the bracketing interval at `index`. As storage changes slowly between calls, the interval is usually
+    found in zero or one moves. Returns the interpolated value and the index of the bracketing interval.
+    """
+    last = xp.shape[0] - 1
+
+    if x <= xp[0]:
+        return fp[0], 0
+    if x >= xp[last]:
+        return fp[last], max(0, last - 1)
+
+    while index < last - 1 and xp[index + 1] <= x:
+        index += 1
+    while index > 0 and xp[index] > x:
+        index -= 1
+
+    return slopes[index] * (x - xp[index]) + fp[index], index
+
+
+@njit(cache=True)
+def _interp_surface_minmax(
+    x: float, xp: np.ndarray, fp: np.ndarray, slopes: np.ndarray, index: int
+) -> tuple[float, float, float, int]:
+    """
+    Interpolates the surface, minimum release and maximum release curves (rows of `fp` and `slopes`, sampled
+    on the common storage axis `xp`) with a single search for the bracketing interval, resumed at `index`.
+    Returns the three interpolated values and the index of the bracketing interval.
+    """
+    last = xp.shape[0] - 1
+
+    if x <= xp[0]:
+        return fp[0, 0], fp[1, 0], fp[2, 0], 0
+    if x >= xp[last]:
+        return fp[0, last], fp[1, last], fp[2, last], max(0, last - 1)
+
+    while index < last - 1 and xp[index + 1] <= x:
+        index += 1
+    while index > 0 and xp[index] > x:
+        index -= 1
+
+    offset = x - xp[index]
+
+    return (
+        slopes[0, index] * offset + fp[0, index],
+        slopes[1, index] * offset + fp[1, index],
+        slopes[2, index] * offset + fp[2, index],
+        index,
+    )
+
+
+@njit(cache=True, nogil=True)
+def _integrate_storage(
+    current_storage: float,
+    inflow: float,
+    total_action: float,
+    evaporation_rate_per_second: float,
+    integration_seconds: np.ndarray,
+    surface_minmax_xp: np.ndarray,
+    surface_minmax_fp: np.ndarray,
+    surface_minmax_slopes: np.ndarray,
+    surface_minmax_index: int,
+) -> tuple[float, float, int]:
+    """
+    Integrates the water balance of a reservoir over the sub-steps of one timestep.
+    Returns the final storage, the average release per second over the sub-steps and the last
+    interpolation index in the surface and min/max release table.
+    """
+    release_sum = 0.0
+    number_of_sub_steps = integration_seconds.shape[0]
+
+    for sub_step in range(number_of_sub_steps):
+        integration_time_seconds = integration_seconds[sub_step]
+
+        surface, min_possible_release, max_possible_release, surface_minmax_index = _interp_surface_minmax(
+            current_storage, surface_minmax_xp, surface_minmax_fp, surface_minmax_slopes, surface_minmax_index
+        )
+
+        evaporation = surface * (evaporation_rate_per_second * integration_time_seconds)
+
+        release_per_second = min(max_possible_release, max(min_possible_release, total_action))
+
+        release_sum += release_per_second
+
+        total_addition = inflow * integration_time_seconds
+
+        current_storage += total_addition - evaporation - release_per_second * integration_time_seconds
+
+    return current_storage, release_sum / number_of_sub_steps, surface_minmax_index
+
+
+@njit(cache=True, nogil=True)
+def _record_step(
+    history: np.ndarray,
+    step: int,
+    inflow: float,
+    total_action: float,
+    evaporation_rates: np.ndarray,
+    month: int,
+    timestep_seconds: float,
+    integration_seconds: np.ndarray,
+    surface_minmax_xp: np.ndarray,
+    surface_minmax_fp: np.ndarray,
+    surface_minmax_slopes: np.ndarray,
+    surface_minmax_index: int,
+    level_xp: np.ndarray,
+    level_fp: np.ndarray,
+    level_slopes: np.ndarray,
+    level_index: int,
+) -> tuple[float, float, int, int]:
+    """
+    Integrates timestep `step` starting from the storage recorded in `history` and records the resulting
+    storage, level and average release in it. The evaporation rate (cm per timestep) is taken from
+    `evaporation_rates` for `month`. Returns the new storage, the average release and the last
+    interpolation indices in the surface and min/max release table and in the level table.
+    """
+    evaporation_rate_per_second = evaporation_rates[month] / (100 * timestep_seconds)
+
+    storage, average_release, surface_minmax_index = _integrate_storage(
+        history[STORAGE, step],
+        inflow,
+        total_action,
+        evaporation_rate_per_second,
+        integration_seconds,
+        surface_minmax_xp,
+        surface_minmax_fp,
+        surface_minmax_slopes,
+        surface_minmax_index,
+    )
+    level, level_index = _interp_from_index(storage, level_xp, level_fp, level_slopes, level_index)
+
+    history[STORAGE, step + 1] = storage
+    history[LEVEL, step] = level
+    history[RELEASE, step] = average_release
+
+    return storage, average_release, surface_minmax_index, level_index
 
 
 class Reservoir(ControlledFacility):
@@ -13,18 +169,24 @@ class Reservoir(ControlledFacility):
     ----------
     name: str
         Lowercase non-spaced name of the reservoir
+    history: np.array (3xH)
+        Storage (m3), level (m) and average release (m3/s) of the reservoir throughout the simulation
+        horizon, as rows STORAGE, LEVEL and RELEASE of one buffer
     storage_vector: np.array (1xH)
         m3
         A vector that holds the volume of the water in the reservoir
-        throughout the simulation horizon
+        throughout the simulation horizon (row STORAGE of history)
     level_vector: np.array (1xH)
         m
         A vector that holds the elevation of the water in the reservoir
-        throughout the simulation horizon
+        throughout the simulation horizon (row LEVEL of history)
     release_vector: np.array (1xH)
         m3/s
         A vector that holds the actual average release per month
-        from the reservoir throughout the simulation horizon
+        from the reservoir throughout the simulation horizon (row RELEASE of history)
+    recorded_steps: int
+        Number of timesteps written to level_vector and release_vector
+        (storage_vector holds one extra element, the initial storage)
     evap_rates: np.array (1x12)
         cm
         Monthly evaporation rates of the reservoir
@@ -33,6 +195,8 @@ class Reservoir(ControlledFacility):
     -------
     determine_info()
         Return dictionary with parameters of the reservoir.
+    determine_level()
+        Returns the level(height) of the current storage.
     storage_to_level(h=float)
         Returns the level(height) based on volume.
     level_to_storage(s=float)
@@ -62,85 +226,155 @@ class Reservoir(ControlledFacility):
         self.stored_water: float = stored_water
 
         self.evap_rates = evap_rates
-        self.storage_to_minmax_rel = storage_to_minmax_rel
-        self.storage_to_level_rel = storage_to_level_rel
-        self.storage_to_surface_rel = storage_to_surface_rel
+        # Evaporation rates as an array for the integration kernel, keeping the dtype and memory of an incoming
+        # array (e.g. a float32 column view of shared exogenous data)
+        self._evap_rates_array = np.asarray(evap_rates)
+        # Reported in every info dict, so it is converted once rather than on every step
+        self._evap_rates_list: list[float] = (
+            np.asarray(evap_rates).tolist() if hasattr(evap_rates, "tolist") else list(evap_rates)
+        )
+        self.storage_to_minmax_rel = np.ascontiguousarray(storage_to_minmax_rel, dtype=np.float64)
+        self.storage_to_level_rel = np.ascontiguousarray(storage_to_level_rel, dtype=np.float64)
+        self.storage_to_surface_rel = np.ascontiguousarray(storage_to_surface_rel, dtype=np.float64)
+
+        # Surface and min/max release curves sampled on the union of their storage breakpoints. The curves are
+        # piecewise linear, so this is exact and lets the integration loop share one interval search between them.
+        self._surface_minmax_xp = np.union1d(self.storage_to_surface_rel[0], self.storage_to_minmax_rel[0])
+        self._surface_minmax_fp = np.ascontiguousarray(
+            [
+                np.interp(self._surface_minmax_xp, self.storage_to_surface_rel[0], self.storage_to_surface_rel[1]),
+                np.interp(self._surface_minmax_xp, self.storage_to_minmax_rel[0], self.storage_to_minmax_rel[1]),
+                np.interp(self._surface_minmax_xp, self.storage_to_minmax_rel[0], self.storage_to_minmax_rel[2]),
+            ]
+        )
+
+        # Segment slopes of every table, so that a lookup after the interval search is a single multiply-add
+        self._level_slopes = _segment_slopes(self.storage_to_level_rel[0], self.storage_to_level_rel[1])
+        self._surface_slopes = _segment_slopes(self.storage_to_surface_rel[0], self.storage_to_surface_rel[1])
+        self._minmax_slopes = _segment_slopes(self.storage_to_minmax_rel[0], self.storage_to_minmax_rel[1:])
+        self._surface_minmax_slopes = _segment_slopes(self._surface_minmax_xp, self._surface_minmax_fp)
 
-        self.storage_vector = []
-        self.level_vector = []
-        self.release_vector = []
+        # Last bracketing intervals found in the storage relation tables, used to resume the interpolation search
+        self._level_index: int = 0
+        self._surface_index: int = 0
+        self._minmax_index: int = 0
+        self._surface_minmax_index: int = 0
+
+        # Storage, level and release are recorded together by the integration kernel. The level and release
+        # rows are one element longer than needed, as storage also holds the initial storage.
+        self.history = np.empty((3, INITIAL_BUFFER_SIZE + 1), dtype=np.float64)
+        self.recorded_steps: int = 0
 
         # Initialise storage vector
-        self.storage_vector.append(stored_water)
+        self.history[STORAGE, 0] = stored_water
 
         self.objective_function = objective_function
         self.objective_name = objective_name
 
         self.integration_timestep_size: relativedelta = integration_timestep_size
+        self.integration_step_seconds: Optional[float] = fixed_duration_seconds(integration_timestep_size)
+        self._integration_seconds_cache: dict[float, np.ndarray] = {}
 
         # self.water_level = self.storage_to_level(self.stored_water)
 
-    def determine_reward(self) -> float:
-        # Pass water level to reward function
-        return self.objective_function(self.storage_to_level(self.stored_water))
-
-    def determine_outflow(self, actions: np.array) -> list[float]:
-        total_action = np.sum(actions)
-
-        current_storage = self.storage_vector[-1]
-        sub_releases = np.empty(0, dtype=np.float64)
-
-        final_date = self.current_date + self.timestep_size
-        timestep_seconds = (final_date - self.current_date).total_seconds()
-        evaporatio_rate_per_second = self.evap_rates[self.determine_month()] / (100 * timestep_seconds)
-
-        while self.current_date < final_date:
-            next_date = min(final_date, self.current_date + self.integration_timestep_size)
-            integration_time_seconds = (next_date - self.current_date).total_seconds()
-            self.current_date = next_date
-
-            surface = self.storage_to_surface(current_storage)
+    @property
+    def storage_vector(self) -> np.ndarray:
+        return self.history[STORAGE, : self.recorded_steps + 1]
 
-            evaporation = surface * (evaporatio_rate_per_second * integration_time_seconds)
+    @property
+    def level_vector(self) -> np.ndarray:
+        return self.history[LEVEL, : self.recorded_steps]
 
-            min_possible_release, max_possible_release = self.storage_to_minmax(current_storage)
+    @property
+    def release_vector(self) -> np.ndarray:
+        return self.history[RELEASE, : self.recorded_steps]
 
-            release_per_second = min(max_possible_release, max(min_possible_release, total_action))
+    def determine_level(self) -> float:
+        # The level of the current storage is recorded by the integration step that produced it
+        if self.recorded_steps:
+            return self.history[LEVEL, self.recorded_steps - 1]
+        return self.storage_to_level(self.stored_water)
 
-            sub_releases = np.append(sub_releases, release_per_second)
-
-            total_addition = self.get_inflow(self.timestep) * integration_time_seconds
-
-            current_storage += total_addition - evaporation - release_per_second * integration_time_seconds
-
-        # Update the amount of water in the Reservoir
-        self.storage_vector.append(current_storage)
-        self.stored_water = current_storage
-
-        # Record level based on storage for time t
-        self.level_vector.append(self.storage_to_level(current_storage))
+    def determine_reward(self) -> float:
+        # Pass water level to reward function
+        return self.objective_function(self.determine_level())
 
-        # Calculate the ouflow of water
-        average_release = np.mean(sub_releases, dtype=np.float64)
-        self.release_vector.append(average_release)
+    def determine_outflow(self, actions: np.array) -> list[float]:
+        actions = np.asarray(actions)
+        total_action = float(actions.sum())
+
+        timestep_seconds = self.determine_timestep_seconds()
+
+        self.history = ensure_capacity(self.history, self.recorded_steps + 2)
+
+        # Update the amount of water in the Reservoir and record its level and ouflow for time t
+        self.stored_water, average_release, self._surface_minmax_index, self._level_index = _record_step(
+            self.history,
+            self.recorded_steps,
+            self.get_inflow(self.timestep),
+            total_action,
+            self._evap_rates_array,
+            self.determine_month(),
+            timestep_seconds,
+            self.determine_integration_seconds(timestep_seconds),
+            self._surface_minmax_xp,
+            self._surface_minmax_fp,
+            self._surface_minmax_slopes,
+            self._surface_minmax_index,
+            self.storage_to_level_rel[0],
+            self.storage_to_level_rel[1],
+            self._level_slopes,
+            self._level_index,
+        )
+        self.current_date += timedelta(seconds=timestep_seconds)
+        self.recorded_steps += 1
 
         # Split release for different destinations
         if self.should_split_release and total_action != 0:
-            self.split_release = [(action / total_action) for action in actions]
+            self.split_release = actions / total_action
 
         return average_release
 
+    def determine_integration_seconds(self, timestep_seconds: float) -> np.ndarray:
+        """
+        Returns the length in seconds of every integration sub-step of a timestep starting at the current date.
+        The last sub-step is shortened so that the integration ends exactly at the end of the timestep.
+        """
+        if self.integration_step_seconds is not None:
+            # Fixed-length sub-steps only depend on the timestep length, so the result can be reused
+            if timestep_seconds not in self._integration_seconds_cache:
+                number_of_full_steps, remainder_seconds = divmod(timestep_seconds, self.integration_step_seconds)
+                integration_seconds = np.full(int(number_of_full_steps), self.integration_step_seconds)
+                if remainder_seconds:
+                    integration_seconds = np.append(integration_seconds, remainder_seconds)
+                self._integration_seconds_cache[timestep_seconds] = integration_seconds
+
+            return self._integration_seconds_cache[timestep_seconds]
+
+        integration_seconds = []
+        current_date = self.current_date
+        final_date = self.current_date + timedelta(seconds=timestep_seconds)
+        while current_date < final_date:
+            next_date = min(final_date, current_date + self.integration_timestep_size)
+            integration_seconds.append((next_date - current_date).total_seconds())
+            current_date = next_date
+
+        return np.array(integration_seconds, dtype=np.float64)
+
     def determine_info(self) -> dict:
         info = {
             "name": self.name,
             "stored_water": self.stored_water,
-            "current_level": self.level_vector[-1] if self.level_vector else None,
-            "current_release": self.release_vector[-1] if self.release_vector else None,
-            "evaporation_rates": self.evap_rates.tolist(),
+            "current_level": self.history[LEVEL, self.recorded_steps - 1] if self.recorded_steps else None,
+            "current_release": self.history[RELEASE, self.recorded_steps - 1] if self.recorded_steps else None,
+            "evaporation_rates": self._evap_rates_list,
         }
         return info
 
-    def determine_observation(self) -> float:
+    def determine_observation(self, out: Optional[np.ndarray] = None) -> float:
+        if out is not None:
+            out[:] = self.stored_water
+            return out
         return self.stored_water
 
     def is_terminated(self) -> bool:
@@ -150,10 +384,16 @@ class Reservoir(ControlledFacility):
         return self.timestep % 12
 
     def storage_to_level(self, s: float) -> float:
-        return self.modified_interp(s, self.storage_to_level_rel[0], self.storage_to_level_rel[1])
+        level, self._level_index = _interp_from_index(
+            s, self.storage_to_level_rel[0], self.storage_to_level_rel[1], self._level_slopes, self._level_index
+        )
+        return level
 
     def storage_to_surface(self, s: float) -> float:
-        return self.modified_interp(s, self.storage_to_surface_rel[0], self.storage_to_surface_rel[1])
+        surface, self._surface_index = _interp_from_index(
+            s, self.storage_to_surface_rel[0], self.storage_to_surface_rel[1], self._surface_slopes, self._surface_index
+        )
+        return surface
 
     def level_to_minmax(self, h) -> tuple[np.ndarray, np.ndarray]:
         return (
@@ -161,22 +401,16 @@ class Reservoir(ControlledFacility):
             np.interp(h, self.rating_curve[0], self.rating_curve[2]),
         )
 
-    def storage_to_minmax(self, s) -> tuple[np.ndarray, np.ndarray]:
-        return (
-            np.interp(s, self.storage_to_minmax_rel[0], self.storage_to_minmax_rel[1]),
-            np.interp(s, self.storage_to_minmax_rel[0], self.storage_to_minmax_rel[2]),
+    def storage_to_minmax(self, s) -> tuple[float, float]:
+        min_release, self._minmax_index = _interp_from_index(
+            s, self.storage_to_minmax_rel[0], self.storage_to_minmax_rel[1], self._minmax_slopes[0], self._minmax_index
         )
-
-    @staticmethod
-    def modified_interp(x: float, xp: float, fp: float, left=None, right=None) -> float:
-        fp = np.asarray(fp)
-
-        return compiled_interp(x, xp, fp, left, right)
+        max_release, self._minmax_index = _interp_from_index(
+            s, self.storage_to_minmax_rel[0], self.storage_to_minmax_rel[2], self._minmax_slopes[1], self._minmax_index
+        )
+        return min_release, max_release
 
     def reset(self) -> None:
         super().reset()
-        stored_water = self.storage_vector[0]
-        self.storage_vector = [stored_water]
-        self.stored_water = stored_water
-        self.level_vector = []
-        self.release_vector = []
+        self.stored_water = self.history[STORAGE, 0]
+        self.recorded_steps = 0
@@ -1,6 +1,9 @@
 import numpy as np
+from typing import Optional
+from dateutil.relativedelta import relativedelta
 
 LIST_SPECIFIC_CHARACTERS = "[],"
+INITIAL_BUFFER_SIZE = 64
 
 
 def generate_random_actions(number_of_actions=4, seed=42) -> np.ndarray:
@@ -10,3 +13,32 @@ def generate_random_actions(number_of_actions=4, seed=42) -> np.ndarray:
 
 def convert_str_to_float_list(string_list: str) -> list:
     return list(map(float, string_list.translate(str.maketrans("", "", LIST_SPECIFIC_CHARACTERS)).split()))
+
+
+def ensure_capacity(buffer: np.ndarray, size: int) -> np.ndarray:
+    """
+    Returns the buffer if it can hold `size` elements along its last axis, otherwise a copy grown by doubling
+    that axis (the same amortised growth strategy as a Python list).
+    """
+    capacity = buffer.shape[-1]
+    if size <= capacity:
+        return buffer
+
+    grown_buffer = np.empty(buffer.shape[:-1] + (max(size, 2 * capacity),), dtype=buffer.dtype)
+    grown_buffer[..., :capacity] = buffer
+    return grown_buffer
+
+
+def fixed_duration_seconds(delta: relativedelta) -> Optional[float]:
+    """
+    Returns the length of `delta` in seconds if it does not depend on the date it is added to,
+    otherwise (e.g. for months, years or absolute fields) returns None.
+    """
+    has_absolute_fields = any(
+        getattr(delta, field) is not None
+        for field in ("year", "month", "day", "weekday", "hour", "minute", "second", "microsecond")
+    )
+    if delta.years or delta.months or delta.leapdays or has_absolute_fields:
+        return None
+
+    return delta.days * 86400 + delta.hours * 3600 + delta.minutes * 60 + delta.seconds + delta.microseconds / 1e6
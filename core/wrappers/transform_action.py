@@ -1,5 +1,6 @@
 import numpy as np
 import gymnasium as gym
+from gymnasium.spaces import Box
 from gymnasium.spaces.dict import Dict
 from core.envs.water_management_system import WaterManagementSystem
 from core.models.facility import ControlledFacility
@@ -25,6 +26,15 @@ class ReshapeArrayAction(gym.ActionWrapper, gym.utils.RecordConstructorArgs):
         gym.utils.RecordConstructorArgs.__init__(self)
         gym.ActionWrapper.__init__(self, env)
 
+        # Actions are flat arrays, concatenated in the order of the water systems, of the dtype of the facilities'
+        # action spaces (so that e.g. float32 actions are not upcast)
+        action_spaces = [env.action_space[name] for name in self.ordered_shapes]
+        self.action_space = Box(
+            low=np.concatenate([np.ravel(space.low) for space in action_spaces]),
+            high=np.concatenate([np.ravel(space.high) for space in action_spaces]),
+            dtype=np.result_type(*(space.dtype for space in action_spaces)),
+        )
+
     def action(self, action):
         reshaped_actions = {}
 
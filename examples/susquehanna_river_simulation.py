@@ -1,5 +1,9 @@
+import os
 import numpy as np
+from functools import lru_cache
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
+from typing import Optional
 from gymnasium.spaces import Box
 from gymnasium.wrappers.time_limit import TimeLimit
 from datetime import datetime
@@ -15,34 +19,177 @@ from core.wrappers.transform_action import ReshapeArrayAction
 data_directory = Path(__file__).parents[1] / "examples" / "data" / "susquehanna_river"
 
 
-def create_susquehanna_river_env() -> WaterManagementSystem:
-    class ReservoirDateDependendObjetive(Reservoir):
-        def determine_reward(self) -> float:
-            is_weekend = self.current_date.weekday() < 5
+def _npy_copy(path: Path) -> Optional[Path]:
+    """
+    Returns the binary .npy copy of a text data file, which is (re)generated if it is missing or older than the
+    text file, or None if it cannot be written (e.g. in a read-only installation). The copies are not committed.
+    """
+    npy_path = path.with_suffix(".npy")
+    if npy_path.exists() and npy_path.stat().st_mtime >= path.stat().st_mtime:
+        return npy_path
 
-            return self.objective_function(is_weekend, self.storage_to_level(self.stored_water))
+    # Written under a temporary name and then renamed, so that other processes never read a partial copy
+    temporary_path = npy_path.with_name(f"{npy_path.stem}.{os.getpid()}.tmp.npy")
+    try:
+        np.save(temporary_path, np.loadtxt(path))
+        os.replace(temporary_path, npy_path)
+    except OSError:
+        temporary_path.unlink(missing_ok=True)
+        return None
+    return npy_path
 
-    class PowerPlantSequentialObjetive(PowerPlant):
-        def determine_reward(self) -> float:
-            return self.objective_function(self.timestep, self.determine_production())
+
+@lru_cache(maxsize=None)
+def _load(path: Path, dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    Loads a data file as an array of `dtype` once per process. The binary .npy copy of the file (see
+    _npy_copy) is memory-mapped, so that all processes (e.g. the workers of a vector environment) share
+    one copy of it in the page cache instead of parsing the text; arrays converted to another dtype are
+    private copies. The array is shared by all environments created in the process, so it is read-only.
+    """
+    npy_path = _npy_copy(path)
+    data = np.load(npy_path, mmap_mode="r") if npy_path is not None else np.loadtxt(path)
+    data = data.astype(dtype, copy=False)
+    data.flags.writeable = False
+    return data
+
+
+def save_npy_copies(directory: Path = data_directory) -> None:
+    """
+    Generates the binary .npy copy of every (non-empty) .txt data file in `directory` that is missing or outdated,
+    ahead of the first _load.
+    """
+    for path in sorted(directory.rglob("*.txt")):
+        if path.stat().st_size:
+            _npy_copy(path)
+
+
+# Exogenous series stored as the columns of one matrix, as paths relative to the data directory
+EXOGENOUS_SERIES = (
+    "demands/Atomic.txt",
+    "demands/Baltimore.txt",
+    "demands/Chester.txt",
+    "demands/Downstream.txt",
+    "inflows/InflowConowingoMain.txt",
+    "inflows/InflowConowingoLateral.txt",
+    "reservoirs/evap_Conowingo.txt",
+)
+
+
+@lru_cache(maxsize=None)
+def _load_exogenous() -> np.ndarray:
+    """
+    Returns the exogenous series as the columns of one read-only, C-ordered (timesteps x series) float32 matrix,
+    so that the values of all series at a timestep are adjacent in memory.
+    """
+    exogenous = np.ascontiguousarray(
+        np.stack([_load(data_directory / series, np.float32) for series in EXOGENOUS_SERIES], axis=1)
+    )
+    exogenous.flags.writeable = False
+    return exogenous
+
+
+def _exogenous(exogenous: np.ndarray, series: str) -> np.ndarray:
+    return exogenous[:, EXOGENOUS_SERIES.index(series)]
+
+
+def load_susquehanna_river_data() -> dict[str, np.ndarray]:
+    """
+    Returns the (read-only) arrays an environment is created from, by name.
+    """
+    return {
+        "exogenous": _load_exogenous(),
+        "energy_prices": _load(data_directory / "reservoirs" / "energy_prices.txt", np.float32),
+        "storage_to_minmax_rel": _load(data_directory / "reservoirs" / "store_min_max_release_Conowingo.txt"),
+        "storage_to_level_rel": _load(data_directory / "reservoirs" / "store_level_rel_Conowingo.txt"),
+        "storage_to_surface_rel": _load(data_directory / "reservoirs" / "store_sur_rel_Conowingo.txt"),
+    }
+
+
+def share_susquehanna_river_data() -> tuple[dict[str, tuple[str, tuple, str]], list[SharedMemory]]:
+    """
+    Loads the data of the environment once and copies every array into a block of shared memory, so that
+    processes creating environments (e.g. the workers of a vector environment) attach to it instead of loading
+    the data themselves.
+
+    Returns:
+    ----------
+    tuple[dict[str, tuple[str, tuple, str]], list[SharedMemory]]
+        Config for create_susquehanna_river_env_from_shared, with the (shared memory name, shape, dtype) of every
+        array, and the shared memory blocks. The caller keeps the blocks while environments are created from the
+        config, and closes and unlinks them afterwards.
+    """
+    config = {}
+    shared_memory = []
+
+    for name, data in load_susquehanna_river_data().items():
+        block = SharedMemory(create=True, size=max(data.nbytes, 1))
+        np.ndarray(data.shape, dtype=data.dtype, buffer=block.buf)[...] = data
+        config[name] = (block.name, data.shape, data.dtype.str)
+        shared_memory.append(block)
+
+    return config, shared_memory
+
+
+# Shared memory blocks attached to by this process, by name. They are kept open as long as the process lives,
+# since the environments created from them refer to their buffers.
+_attached_shared_memory: dict[str, SharedMemory] = {}
+
+
+def _attach(name: str, shape: tuple, dtype: str) -> np.ndarray:
+    if name not in _attached_shared_memory:
+        _attached_shared_memory[name] = SharedMemory(name=name)
+    data = np.ndarray(shape, dtype=dtype, buffer=_attached_shared_memory[name].buf)
+    data.flags.writeable = False
+    return data
+
+
+def create_susquehanna_river_env_from_shared(config: dict[str, tuple[str, tuple, str]]) -> WaterManagementSystem:
+    """
+    Creates the environment from the arrays shared by share_susquehanna_river_data, e.g. as
+    `partial(create_susquehanna_river_env_from_shared, config)` for the workers of a vector environment.
+    """
+    return create_susquehanna_river_env({name: _attach(*shared_array) for name, shared_array in config.items()})
+
+
+# Defined at module level, so that the environment can be pickled (e.g. to the workers of a vector environment)
+class ReservoirDateDependendObjetive(Reservoir):
+    def determine_reward(self) -> float:
+        is_weekend = self.current_date.weekday() < 5
+
+        return self.objective_function(is_weekend, self.determine_level())
+
+
+class PowerPlantSequentialObjetive(PowerPlant):
+    def determine_reward(self) -> float:
+        return self.objective_function(self.timestep, self.determine_production())
+
+
+def create_susquehanna_river_env(data: Optional[dict[str, np.ndarray]] = None) -> WaterManagementSystem:
+    # Exogenous series (evaporation, prices, demands, inflows) are loaded as float32, the storage relation
+    # tables as float64, as their breakpoints (up to ~3e9 m3) and the reservoir state need the precision.
+    # Demands, inflows and evaporation are columns of one matrix (see _load_exogenous).
+    if data is None:
+        data = load_susquehanna_river_data()
+    exogenous = data["exogenous"]
 
     Conowingo_reservoir = ReservoirDateDependendObjetive(
         name="Conowingo",
-        observation_space=Box(low=0, high=3279501720),
-        action_space=Box(low=0, high=1242857, shape=(4,)),
+        observation_space=Box(low=0, high=3279501720, dtype=np.float32),
+        action_space=Box(low=0, high=1242857, shape=(4,), dtype=np.float32),
         integration_timestep_size=relativedelta(hours=1),
         objective_function=Objective.is_greater_than_minimum_with_condition(106.5),
         objective_name="recreation",
         stored_water=2641905256.0,
-        evap_rates=np.loadtxt(data_directory / "reservoirs" / "evap_Conowingo.txt"),
-        storage_to_minmax_rel=np.loadtxt(data_directory / "reservoirs" / "store_min_max_release_Conowingo.txt"),
-        storage_to_level_rel=np.loadtxt(data_directory / "reservoirs" / "store_level_rel_Conowingo.txt"),
-        storage_to_surface_rel=np.loadtxt(data_directory / "reservoirs" / "store_sur_rel_Conowingo.txt"),
+        evap_rates=_exogenous(exogenous, "reservoirs/evap_Conowingo.txt"),
+        storage_to_minmax_rel=data["storage_to_minmax_rel"],
+        storage_to_level_rel=data["storage_to_level_rel"],
+        storage_to_surface_rel=data["storage_to_surface_rel"],
     )
 
     Power_plant = PowerPlantSequentialObjetive(
         name="Power_plant",
-        objective_function=Objective.sequential_scalar(np.loadtxt(data_directory / "reservoirs" / "energy_prices.txt")),
+        objective_function=Objective.sequential_scalar(data["energy_prices"]),
         objective_name="energy_revenue",
         efficiency=0.79,
         min_turbine_flow=210.0,
@@ -54,28 +201,28 @@ def create_susquehanna_river_env() -> WaterManagementSystem:
 
     Atomic_system = IrrigationDistrict(
         name="Atomic",
-        all_demand=np.loadtxt(data_directory / "demands" / "Atomic.txt"),
+        all_demand=_exogenous(exogenous, "demands/Atomic.txt"),
         objective_function=Objective.supply_ratio_maximised,
         objective_name="water_supply",
     )
 
     Baltimore_system = IrrigationDistrict(
         name="Baltimore",
-        all_demand=np.loadtxt(data_directory / "demands" / "Baltimore.txt"),
+        all_demand=_exogenous(exogenous, "demands/Baltimore.txt"),
         objective_function=Objective.supply_ratio_maximised,
         objective_name="water_supply",
     )
 
     Chester_system = IrrigationDistrict(
         name="Chester",
-        all_demand=np.loadtxt(data_directory / "demands" / "Chester.txt"),
+        all_demand=_exogenous(exogenous, "demands/Chester.txt"),
         objective_function=Objective.supply_ratio_maximised,
         objective_name="water_supply",
     )
 
     Downstream_system = IrrigationDistrict(
         name="Downstream",
-        all_demand=np.loadtxt(data_directory / "demands" / "Downstream.txt"),
+        all_demand=_exogenous(exogenous, "demands/Downstream.txt"),
         objective_function=Objective.deficit_squared_ratio_minimised,
         objective_name="enviromental_shortage",
     )
@@ -84,14 +231,14 @@ def create_susquehanna_river_env() -> WaterManagementSystem:
         name="conowingo_inflow_main",
         destinations=Conowingo_reservoir,
         max_capacity=float("inf"),
-        all_inflow=np.loadtxt(data_directory / "inflows" / "InflowConowingoMain.txt"),
+        all_inflow=_exogenous(exogenous, "inflows/InflowConowingoMain.txt"),
     )
 
     Conowingo_inflow_lateral = Inflow(
         name="conowingo_inflow_lateral",
         destinations=Conowingo_reservoir,
         max_capacity=float("inf"),
-        all_inflow=np.loadtxt(data_directory / "inflows" / "InflowConowingoLateral.txt"),
+        all_inflow=_exogenous(exogenous, "inflows/InflowConowingoLateral.txt"),
     )
 
     Conowingo_outflow = Flow(
@@ -116,10 +263,10 @@ def create_susquehanna_river_env() -> WaterManagementSystem:
     #     objective_function=Objective.no_objective,
     #     objective_name="",
     #     stored_water=0,
-    #     evap_rates=np.loadtxt(data_directory / "reservoirs" / "evap_Muddy.txt"),
-    #     storage_to_minmax_rel=np.loadtxt(data_directory / "reservoirs" / "store_min_max_release_Muddy.txt"),
-    #     storage_to_level_rel=np.loadtxt(data_directory / "reservoirs" / "store_level_rel_Muddy.txt"),
-    #     storage_to_surface_rel=np.loadtxt(data_directory / "reservoirs" / "store_sur_rel_Muddy.txt"),
+    #     evap_rates=_load(data_directory / "reservoirs" / "evap_Muddy.txt"),
+    #     storage_to_minmax_rel=_load(data_directory / "reservoirs" / "store_min_max_release_Muddy.txt"),
+    #     storage_to_level_rel=_load(data_directory / "reservoirs" / "store_level_rel_Muddy.txt"),
+    #     storage_to_surface_rel=_load(data_directory / "reservoirs" / "store_sur_rel_Muddy.txt"),
     # )
 
     water_management_system = WaterManagementSystem(
@@ -150,3 +297,7 @@ def create_susquehanna_river_env() -> WaterManagementSystem:
     water_management_system = TimeLimit(water_management_system, max_episode_steps=2190)
 
     return water_management_system
+
+
+if __name__ == "__main__":
+    save_npy_copies()
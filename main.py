@@ -1,3 +1,4 @@
+import logging
 import pprint
 import numpy as np
 from examples.nile_river_simulation import create_nile_river_env
@@ -5,6 +6,27 @@ import csv
 
 make_csv = True
 
+# Progress of the simulation without CSV is logged at debug level, every LOG_INTERVAL timesteps
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+LOG_INTERVAL = 50
+
+# Info values written to the CSV after the timestep and the action, as (water system, key) pairs
+KEYS = (
+    ("GERD", "stored_water"),
+    ("GERD", "current_release"),
+    ("Roseires", "stored_water"),
+    ("Roseires", "current_release"),
+    ("Sennar", "stored_water"),
+    ("Sennar", "current_release"),
+    ("HAD", "stored_water"),
+    ("HAD", "current_release"),
+    ("GERD_power_plant", "monthly_production"),
+)
+
+# Maximum release of GERD, Roseires, Sennar and HAD, which random actions are scaled to
+SCALES = np.array([10000, 10000, 10000, 4000], dtype=np.float64)
+
 
 def nile_river_simulation(nu_of_timesteps=240):
     # Create power plant, reservoir and irrigation district. Initialise with semi-random parameters.
@@ -12,9 +34,27 @@ def nile_river_simulation(nu_of_timesteps=240):
     # for irrigation district.
 
     water_management_system = create_nile_river_env()
+    water_management_system.reset()
 
     if make_csv:
-        with open("verification/group13.csv", "w", newline="") as file:
+        # Rows are collected and written at once after the simulation
+        rows = []
+        np.random.seed(42)
+        # All actions are sampled at once; they are the same as when sampled one timestep at a time
+        actions = generateOutput(nu_of_timesteps)
+        for i in range(nu_of_timesteps):
+            action = actions[i]
+            (
+                final_observation,
+                final_reward,
+                final_terminated,
+                final_truncated,
+                final_info,
+            ) = water_management_system.step(action)
+            values = np.fromiter((final_info[name][key] for name, key in KEYS), dtype=np.float64, count=len(KEYS))
+            rows.append((i, action, *values.tolist()))
+
+        with open("verification/group13.csv", "w", newline="", buffering=1 << 20) as file:
             writer = csv.writer(file)
             writer.writerow(
                 [
@@ -31,36 +71,10 @@ def nile_river_simulation(nu_of_timesteps=240):
                     "Gerd_production",
                 ]
             )
-            np.random.seed(42)
-            for i in range(nu_of_timesteps):
-                action = generateOutput()
-                (
-                    final_observation,
-                    final_reward,
-                    final_terminated,
-                    final_truncated,
-                    final_info,
-                ) = water_management_system.step(action)
-                writer.writerow(
-                    [
-                        i,
-                        action,
-                        ensure_float(final_info.get("GERD")["stored_water"]),
-                        ensure_float(final_info.get("GERD")["current_release"]),
-                        ensure_float(final_info.get("Roseires")["stored_water"]),
-                        ensure_float(final_info.get("Roseires")["current_release"]),
-                        ensure_float(final_info.get("Sennar")["stored_water"]),
-                        ensure_float(final_info.get("Sennar")["current_release"]),
-                        ensure_float(final_info.get("HAD")["stored_water"]),
-                        ensure_float(final_info.get("HAD")["current_release"]),
-                        ensure_float(final_info.get("GERD_power_plant")["monthly_production"]),
-                    ]
-                )
+            writer.writerows(rows)
     else:
-        for _ in range(nu_of_timesteps):
+        for i in range(nu_of_timesteps):
             action = water_management_system.action_space.sample()
-            action = np.array(list(action.values())).flatten()
-            print("Action:", action, "\n")
             (
                 final_observation,
                 final_reward,
@@ -68,24 +82,20 @@ def nile_river_simulation(nu_of_timesteps=240):
                 final_truncated,
                 final_info,
             ) = water_management_system.step(action)
-            print("Reward:", final_reward)
-            pprint.pprint(final_info)
-            print("Is finished:", final_truncated, final_terminated)
+            if i % LOG_INTERVAL == 0 and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Action: %s", action)
+                logger.debug("Reward: %s", final_reward)
+                logger.debug("Info: %s", pprint.pformat(final_info))
+                logger.debug("Is finished: %s %s", final_truncated, final_terminated)
 
 
-def generateOutput():
-    random_values = np.random.rand(
-        4,
-    ) * [10000, 10000, 10000, 4000]
+def generateOutput(nu_of_timesteps=None):
+    # One action, or an array of an action per timestep
+    shape = (4,) if nu_of_timesteps is None else (nu_of_timesteps, 4)
+    random_values = np.random.rand(*shape) * SCALES
 
     return random_values
 
 
-def ensure_float(value):
-    if isinstance(value, np.ndarray):
-        return value.item()
-    return value
-
-
 if __name__ == "__main__":
     nile_river_simulation()
@@ -0,0 +1,7 @@
+import numpy as np
+
+
+def storage_proportional_policy(observation: np.ndarray) -> np.ndarray:
+    # Releases depend on the storage, so that episodes differ from a fixed sequence of actions. Defined at module
+    # level, so that it can be pickled to the workers of a batch.
+    return np.full(4, observation[0] * 1e-4, dtype=np.float32)
@@ -0,0 +1,20 @@
+import numpy as np
+from core.envs.batch_runner import run_batch, run_episode
+from examples.susquehanna_river_simulation import create_susquehanna_river_env
+from test.helpers import storage_proportional_policy
+
+SEEDS = [0, 1, 2]
+
+
+def test_run_batch_matches_sequential_episodes() -> None:
+    sequential_rewards = np.stack(
+        [run_episode(create_susquehanna_river_env, storage_proportional_policy, seed) for seed in SEEDS]
+    )
+
+    for use_threads in [False, True]:
+        batch_rewards = run_batch(
+            create_susquehanna_river_env, storage_proportional_policy, SEEDS, max_workers=2, use_threads=use_threads
+        )
+
+        assert batch_rewards.shape == (len(SEEDS), 4)
+        assert np.array_equal(batch_rewards, sequential_rewards)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from core.models.irrigation_district import IrrigationDistrict
+from core.models.objective import Objective
+from core.utils.utils import INITIAL_BUFFER_SIZE
+
+NUMBER_OF_STEPS = 2 * INITIAL_BUFFER_SIZE + 3
+
+
+def create_irrigation_district() -> IrrigationDistrict:
+    return IrrigationDistrict("district", [2.0, 5.0, 3.0], Objective.deficit_minimised, "deficit")
+
+
+def test_inflow_and_outflow_hold_only_recorded_steps() -> None:
+    irrigation_district = create_irrigation_district()
+    assert len(irrigation_district.all_inflow) == 0
+    assert len(irrigation_district.all_outflow) == 0
+
+    # More steps than the initial capacity of the buffers, so that they are grown
+    inflows = np.arange(NUMBER_OF_STEPS, dtype=np.float64)
+    for timestep, inflow in enumerate(inflows):
+        irrigation_district.set_inflow(timestep, inflow / 2)
+        irrigation_district.set_inflow(timestep, inflow / 2)
+        irrigation_district.step()
+
+    demands = np.resize([2.0, 5.0, 3.0], NUMBER_OF_STEPS)
+    assert np.array_equal(irrigation_district.all_inflow, inflows)
+    assert np.array_equal(irrigation_district.all_outflow, inflows - np.minimum(demands, inflows))
+
+    irrigation_district.reset()
+    assert len(irrigation_district.all_inflow) == 0
+    assert len(irrigation_district.all_outflow) == 0
+
+
+def test_get_inflow_and_outflow_index_like_lists() -> None:
+    irrigation_district = create_irrigation_district()
+    irrigation_district.set_inflow(0, 3.0)
+    irrigation_district.step()
+
+    assert irrigation_district.get_inflow(-1) == 3.0
+    assert irrigation_district.get_outflow(-1) == 1.0
+    for get_flow in [irrigation_district.get_inflow, irrigation_district.get_outflow]:
+        with pytest.raises(IndexError):
+            get_flow(1)
+        with pytest.raises(IndexError):
+            get_flow(-2)
@@ -0,0 +1,54 @@
+import numpy as np
+from core.models.flow import Flow, Inflow
+from core.models.irrigation_district import IrrigationDistrict
+from core.models.objective import Objective
+
+
+def create_irrigation_district(name: str) -> IrrigationDistrict:
+    return IrrigationDistrict(name, [1.0], Objective.no_objective, "")
+
+
+def determine_inflows_by_destination(flow: Flow) -> list[float]:
+    # The inflow of every destination computed one destination at a time, as the reference
+    return [
+        flow.determine_source_outflow_by_destination(destination_index, destination_inflow_ratio)
+        for destination_index, destination_inflow_ratio in enumerate(flow.destinations.values())
+    ]
+
+
+def test_destination_inflows_match_inflows_by_destination() -> None:
+    sources = [create_irrigation_district("source_1"), create_irrigation_district("source_2")]
+    destinations = [create_irrigation_district(f"destination_{index}") for index in range(3)]
+    flow = Flow(
+        "flow",
+        sources,
+        dict(zip(destinations, [0.2, 0.3, 0.5])),
+        max_capacity=float("inf"),
+        evaporation_rate=0.1,
+        delay=1,
+        default_outflow=7.0,
+    )
+
+    for timestep, outflows in enumerate([(3.0, 5.0), (1.5, 2.5), (0.1, 4.0)]):
+        for source, outflow in zip(sources, outflows):
+            source.record_outflow(outflow)
+        # A source with its own split of the release from the second timestep on
+        sources[1].split_release = np.array([0.6, 0.1, 0.3], dtype=np.float32) if timestep else None
+
+        destination_inflows = flow.determine_destination_inflows()
+        assert destination_inflows.tolist() == determine_inflows_by_destination(flow)
+
+        flow.set_destination_inflow()
+        for destination, destination_inflow in zip(destinations, destination_inflows):
+            assert destination.get_inflow(timestep) == destination_inflow * (1.0 - flow.evaporation_rate)
+
+        flow.timestep += 1
+
+
+def test_inflow_destination_inflows_match_inflows_by_destination() -> None:
+    destinations = [create_irrigation_district(f"destination_{index}") for index in range(2)]
+    inflow = Inflow("inflow", dict(zip(destinations, [0.25, 0.75])), float("inf"), [3.0, 4.0, 6.0])
+
+    for _ in range(4):
+        assert inflow.determine_destination_inflows().tolist() == determine_inflows_by_destination(inflow)
+        inflow.timestep += 1
@@ -0,0 +1,23 @@
+import torch
+from torch import nn
+from gymnasium.vector import AsyncVectorEnv
+from examples.susquehanna_river_simulation import create_susquehanna_river_env
+from core.learners.mones import run_episode, run_vector_episode
+
+POPULATION_SIZE = 3
+
+
+def test_vector_episode_matches_sequential_episodes() -> None:
+    torch.manual_seed(0)
+    population = [nn.Sequential(nn.Linear(1, 4), nn.Tanh(), nn.Linear(4, 4)) for _ in range(POPULATION_SIZE)]
+
+    vector_env = AsyncVectorEnv([create_susquehanna_river_env] * POPULATION_SIZE, shared_memory=True)
+    try:
+        vector_returns = run_vector_episode(vector_env, population)
+    finally:
+        vector_env.close()
+
+    env = create_susquehanna_river_env()
+    sequential_returns = torch.stack([run_episode(env, model) for model in population])
+
+    assert torch.equal(vector_returns, sequential_returns)
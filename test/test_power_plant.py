@@ -0,0 +1,27 @@
+import numpy as np
+from examples.nile_river_simulation import create_nile_river_env
+from core.models.power_plant import PowerPlant
+
+NUMBER_OF_STEPS = 5
+
+
+def test_production_vector_holds_only_recorded_steps() -> None:
+    water_management_system = create_nile_river_env()
+    water_management_system.reset()
+    water_systems = water_management_system.unwrapped.water_systems
+    power_plants = [water_system for water_system in water_systems if isinstance(water_system, PowerPlant)]
+    assert power_plants
+
+    infos = []
+    for action in np.random.default_rng(0).random((NUMBER_OF_STEPS, 4)) * [10000, 10000, 10000, 4000]:
+        infos.append(water_management_system.step(action)[-1])
+
+    for power_plant in power_plants:
+        productions = [info[power_plant.name]["monthly_production"] for info in infos]
+        assert power_plant.production_vector.tolist() == productions
+        assert power_plant.production_sum == sum(productions)
+
+    water_management_system.reset()
+
+    for power_plant in power_plants:
+        assert len(power_plant.production_vector) == 0
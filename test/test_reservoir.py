@@ -0,0 +1,81 @@
+import numpy as np
+from examples.nile_river_simulation import create_nile_river_env
+from examples.susquehanna_river_simulation import create_susquehanna_river_env
+from core.models.reservoir import Reservoir, _interp_from_index, _interp_surface_minmax, _segment_slopes
+
+# Unevenly spaced breakpoints, with values to interpolate below, above, on and between them
+XP = np.array([0.0, 1.0, 2.5, 2.75, 6.0, 10.0, 10.5])
+FP = np.array(
+    [
+        [3.0, 4.5, 4.0, 7.25, 7.25, 1.0, 2.0],
+        [0.0, -1.0, 2.0, 2.0, 5.5, 6.0, 100.0],
+        [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+    ]
+)
+VALUES = np.concatenate(
+    [[-5.0, -1e-9, 10.5 + 1e-9, 20.0], XP, (XP[:-1] + XP[1:]) / 2, np.random.default_rng(0).uniform(-1, 12, 50)]
+)
+
+NUMBER_OF_STEPS = 5
+
+
+def test_interp_from_index_matches_np_interp() -> None:
+    slopes = _segment_slopes(XP, FP[0])
+
+    # The search is resumed from every possible (stale) index
+    for start_index in range(len(XP)):
+        for value in VALUES:
+            interpolated, index = _interp_from_index(value, XP, FP[0], slopes, start_index)
+
+            assert interpolated == np.interp(value, XP, FP[0])
+            assert 0 <= index < len(XP) - 1
+            assert XP[index] <= value < XP[index + 1] or not XP[0] < value < XP[-1]
+
+
+def test_interp_surface_minmax_matches_np_interp() -> None:
+    slopes = _segment_slopes(XP, FP)
+
+    for start_index in range(len(XP)):
+        for value in VALUES:
+            *interpolated, index = _interp_surface_minmax(value, XP, FP, slopes, start_index)
+
+            assert interpolated == [np.interp(value, XP, fp) for fp in FP]
+            assert 0 <= index < len(XP) - 1
+
+
+def test_history_vectors_hold_only_recorded_steps() -> None:
+    water_management_system = create_nile_river_env()
+    water_management_system.reset()
+    water_systems = water_management_system.unwrapped.water_systems
+    reservoirs = [water_system for water_system in water_systems if isinstance(water_system, Reservoir)]
+    initial_storages = [reservoir.stored_water for reservoir in reservoirs]
+
+    infos = []
+    for action in np.random.default_rng(0).random((NUMBER_OF_STEPS, 4)) * [10000, 10000, 10000, 4000]:
+        infos.append(water_management_system.step(action)[-1])
+
+    for reservoir, initial_storage in zip(reservoirs, initial_storages):
+        assert len(reservoir.storage_vector) == NUMBER_OF_STEPS + 1
+        assert len(reservoir.level_vector) == NUMBER_OF_STEPS
+        assert len(reservoir.release_vector) == NUMBER_OF_STEPS
+        storages = [info[reservoir.name]["stored_water"] for info in infos]
+        assert reservoir.storage_vector.tolist() == [initial_storage] + storages
+        assert reservoir.level_vector.tolist() == [info[reservoir.name]["current_level"] for info in infos]
+        assert reservoir.release_vector.tolist() == [info[reservoir.name]["current_release"] for info in infos]
+
+    water_management_system.reset()
+
+    for reservoir, initial_storage in zip(reservoirs, initial_storages):
+        assert reservoir.storage_vector.tolist() == [initial_storage]
+        assert len(reservoir.level_vector) == 0
+        assert len(reservoir.release_vector) == 0
+
+
+def test_list_actions_are_split_like_array_actions() -> None:
+    rewards = []
+    for action in [[100.0, 200.0, 300.0, 400.0], np.array([100.0, 200.0, 300.0, 400.0])]:
+        water_management_system = create_susquehanna_river_env()
+        water_management_system.reset()
+        rewards.append(water_management_system.unwrapped.step({"Conowingo": action})[1])
+
+    assert np.array_equal(rewards[0], rewards[1])
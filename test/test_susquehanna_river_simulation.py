@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from functools import partial
+from core.models.flow import Inflow
+from core.models.irrigation_district import IrrigationDistrict
+from core.models.reservoir import Reservoir
+from core.envs.batch_runner import run_episode
+from examples.susquehanna_river_simulation import (
+    _attached_shared_memory,
+    _load_exogenous,
+    _npy_copy,
+    create_susquehanna_river_env,
+    create_susquehanna_river_env_from_shared,
+    load_susquehanna_river_data,
+    share_susquehanna_river_data,
+)
+from test.helpers import storage_proportional_policy
+
+
+def test_npy_copy_is_generated_and_updated(tmp_path) -> None:
+    path = tmp_path / "series.txt"
+    np.savetxt(path, [1.0, 2.0, 3.0])
+
+    npy_path = _npy_copy(path)
+    assert npy_path == tmp_path / "series.npy"
+    assert np.array_equal(np.load(npy_path), [1.0, 2.0, 3.0])
+
+    # An edited text file is newer than its copy, which is then generated again
+    np.savetxt(path, [4.0, 5.0])
+    os.utime(path, (npy_path.stat().st_mtime + 1,) * 2)
+    assert np.array_equal(np.load(_npy_copy(path)), [4.0, 5.0])
+    assert [file.name for file in sorted(tmp_path.iterdir())] == ["series.npy", "series.txt"]
+
+
+def test_exogenous_series_are_views_of_one_matrix() -> None:
+    exogenous = _load_exogenous()
+    water_systems = create_susquehanna_river_env().unwrapped.water_systems
+
+    series = [water_system.all_demand for water_system in water_systems if isinstance(water_system, IrrigationDistrict)]
+    series += [water_system.all_inflow for water_system in water_systems if isinstance(water_system, Inflow)]
+    series += [water_system._evap_rates_array for water_system in water_systems if isinstance(water_system, Reservoir)]
+
+    assert len(series) == 7
+    assert all(np.shares_memory(values, exogenous) for values in series)
+
+
+def test_env_from_shared_data_matches_env() -> None:
+    config, shared_memory = share_susquehanna_river_data()
+    try:
+        data = load_susquehanna_river_data()
+        assert config.keys() == data.keys()
+        for name, (_, shape, dtype) in config.items():
+            assert shape == data[name].shape
+            assert np.dtype(dtype) == data[name].dtype
+
+        # The facilities read the data from the shared memory attached to by this process
+        water_systems = create_susquehanna_river_env_from_shared(config).unwrapped.water_systems
+        name, shape, dtype = config["exogenous"]
+        shared_exogenous = np.ndarray(shape, dtype=dtype, buffer=_attached_shared_memory[name].buf)
+        assert all(
+            np.shares_memory(water_system.all_demand, shared_exogenous)
+            for water_system in water_systems
+            if isinstance(water_system, IrrigationDistrict)
+        )
+
+        make_env = partial(create_susquehanna_river_env_from_shared, config)
+        shared_rewards = run_episode(make_env, storage_proportional_policy, 0)
+        assert np.array_equal(shared_rewards, run_episode(create_susquehanna_river_env, storage_proportional_policy, 0))
+    finally:
+        for block in shared_memory:
+            block.close()
+            block.unlink()
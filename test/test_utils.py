@@ -0,0 +1,28 @@
+import numpy as np
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+from core.utils.utils import ensure_capacity, fixed_duration_seconds
+
+
+def test_ensure_capacity() -> None:
+    buffer = np.arange(8, dtype=np.float64).reshape(2, 4)
+
+    assert ensure_capacity(buffer, 4) is buffer
+
+    # Grown along the last axis by doubling, or to the requested size if that is larger
+    grown_buffer = ensure_capacity(buffer, 5)
+    assert grown_buffer.shape == (2, 8)
+    assert grown_buffer.dtype == buffer.dtype
+    assert np.array_equal(grown_buffer[:, :4], buffer)
+    assert ensure_capacity(buffer, 20).shape == (2, 20)
+
+
+def test_fixed_duration_seconds() -> None:
+    for delta in [relativedelta(hours=4), relativedelta(days=2, minutes=30), relativedelta(seconds=1, microseconds=5)]:
+        # The same for any date the timestep is added to
+        for date in [datetime(2024, 2, 28), datetime(2025, 3, 30, 23)]:
+            assert fixed_duration_seconds(delta) == (date + delta - date).total_seconds()
+
+    # Durations that depend on the date
+    for delta in [relativedelta(months=1), relativedelta(years=1), relativedelta(day=1), relativedelta(hour=3)]:
+        assert fixed_duration_seconds(delta) is None